@@ -22,13 +22,13 @@ Usage:
 import os
 import sys
 import argparse
+import mmap
 import struct
-import shutil
-import tempfile
 import re
 import logging
 import stat
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 # -------------------- Banner --------------------
@@ -70,62 +70,68 @@ VENDOR_RAMDISK_TYPE_PLATFORM = 1
 VENDOR_RAMDISK_TYPE_RECOVERY = 2
 VENDOR_RAMDISK_TYPE_DLKM = 3
 
+_TYPE_NAMES = ('none', 'platform', 'recovery', 'dlkm')
+
+# Pre-compiled layouts for the vendor_boot v4 header and ramdisk table entries.
+_VB_HDR = struct.Struct(
+    f'<8s5I{VENDOR_RAMDISK_CMDLINE_SIZE}sI{BOOT_PRODUCT_NAME_SIZE}sIIQIII'
+)
+_VB_ENTRY = struct.Struct(f'<III{VENDOR_RAMDISK_NAME_SIZE}s{BOOT_ID_SIZE}s')
+
+# newc cpio header: magic plus 13 ASCII-hex fields of 8 bytes each.
+_CPIO_HDR = struct.Struct('6s8s8s8s8s8s8s8s8s8s8s8s8s8s')
+
+# adaptive-ts.ko touch-fix patterns (aarch64 b.cc/mov instructions).
+_TS_PAT1_OLD = b'\x60\x00\x00\x54\x40\x00'
+_TS_PAT1_NEW = b'\x60\x00\x00\x54\x00\x00'
+_TS_PAT2_OLD = b'\x20\x00\x80\x52'
+_TS_PAT2_NEW = b'\x00\x00\x80\x52'
+
+# key=value lines, comments and surrounding whitespace excluded.
+_PROP_RE = re.compile(r'^[ \t]*([^\s#=][^\s=]*)[ \t]*=[ \t]*(.*?)[ \t\r]*$', re.M)
+
 # -------------------- Vendor Boot Parser --------------------
 class VendorBootHeader:
     # ... (same as PBRP version) ...
     def __init__(self, data):
         self.data = data
-        offset = 0
-        self.magic = data[offset:offset+8]
+        if len(data) < _VB_HDR.size:
+            raise ValueError(f"Image too small for vendor_boot header: {len(data)} bytes")
+        (self.magic,
+         self.header_version,
+         self.page_size,
+         self.kernel_load_addr,
+         self.ramdisk_load_addr,
+         self.vendor_ramdisk_total_size,
+         cmdline_bytes,
+         self.tags_load_addr,
+         product_name_bytes,
+         self.header_size,
+         self.dtb_size,
+         self.dtb_load_addr,
+         self.vendor_ramdisk_table_size,
+         self.vendor_ramdisk_table_num_entries,
+         self.vendor_bootconfig_size) = _VB_HDR.unpack_from(data, 0)
         if self.magic != BOOT_MAGIC_VENDOR_BOOT:
             raise ValueError(f"Invalid magic: expected {BOOT_MAGIC_VENDOR_BOOT}, got {self.magic}")
-        offset += 8
-        self.header_version = struct.unpack('<I', data[offset:offset+4])[0]
-        offset += 4
-        self.page_size = struct.unpack('<I', data[offset:offset+4])[0]
-        offset += 4
-        self.kernel_load_addr = struct.unpack('<I', data[offset:offset+4])[0]
-        offset += 4
-        self.ramdisk_load_addr = struct.unpack('<I', data[offset:offset+4])[0]
-        offset += 4
-        self.vendor_ramdisk_total_size = struct.unpack('<I', data[offset:offset+4])[0]
-        offset += 4
-        cmdline_bytes = data[offset:offset+VENDOR_RAMDISK_CMDLINE_SIZE]
         self.cmdline = cmdline_bytes.rstrip(b'\x00').decode('utf-8', errors='ignore')
-        offset += VENDOR_RAMDISK_CMDLINE_SIZE
-        self.tags_load_addr = struct.unpack('<I', data[offset:offset+4])[0]
-        offset += 4
-        product_name_bytes = data[offset:offset+BOOT_PRODUCT_NAME_SIZE]
         self.product_name = product_name_bytes.rstrip(b'\x00').decode('utf-8', errors='ignore')
-        offset += BOOT_PRODUCT_NAME_SIZE
-        self.header_size = struct.unpack('<I', data[offset:offset+4])[0]
-        offset += 4
-        self.dtb_size = struct.unpack('<I', data[offset:offset+4])[0]
-        offset += 4
-        self.dtb_load_addr = struct.unpack('<Q', data[offset:offset+8])[0]
-        offset += 8
-        self.vendor_ramdisk_table_size = struct.unpack('<I', data[offset:offset+4])[0]
-        offset += 4
-        self.vendor_ramdisk_table_num_entries = struct.unpack('<I', data[offset:offset+4])[0]
-        offset += 4
-        self.vendor_bootconfig_size = struct.unpack('<I', data[offset:offset+4])[0]
-        offset += 4
-        self.table_offset = offset
+        self.table_offset = _VB_HDR.size
 
     def get_ramdisk_entries(self):
-        if self.vendor_ramdisk_table_num_entries == 0:
+        num = self.vendor_ramdisk_table_num_entries
+        if num == 0:
             return []
-        entries = []
-        entry_size = 4 + 4 + 4 + VENDOR_RAMDISK_NAME_SIZE + BOOT_ID_SIZE
-        for i in range(self.vendor_ramdisk_table_num_entries):
-            start = self.table_offset + i * entry_size
-            end = start + entry_size
-            entry_data = self.data[start:end]
-            if len(entry_data) < entry_size:
-                raise ValueError(f"Truncated ramdisk table at entry {i}")
-            entry = VendorRamdiskEntry(entry_data)
-            entries.append(entry)
-        return entries
+        table_end = self.table_offset + num * _VB_ENTRY.size
+        if table_end > len(self.data):
+            raise ValueError(f"Truncated ramdisk table ({num} entries)")
+        table = self.data[self.table_offset:table_end]
+        try:
+            return [VendorRamdiskEntry.from_tuple(t) for t in _VB_ENTRY.iter_unpack(table)]
+        finally:
+            # Entries copy what they need; drop the export on the mmap so a
+            # failure here doesn't pin the mapping open.
+            table.release()
 
     def get_dtb_offset(self):
         ramdisk_start = self.header_size + self.vendor_bootconfig_size
@@ -137,33 +143,47 @@ class VendorBootHeader:
 class VendorRamdiskEntry:
     # ... (same) ...
     def __init__(self, data):
-        self.size = struct.unpack('<I', data[0:4])[0]
-        self.offset = struct.unpack('<I', data[4:8])[0]
-        self.type = struct.unpack('<I', data[8:12])[0]
-        name_bytes = data[12:12+VENDOR_RAMDISK_NAME_SIZE]
+        self._init_fields(*_VB_ENTRY.unpack_from(data, 0))
+
+    @classmethod
+    def from_tuple(cls, fields):
+        """Build an entry from an already-unpacked _VB_ENTRY tuple."""
+        entry = cls.__new__(cls)
+        entry._init_fields(*fields)
+        return entry
+
+    def _init_fields(self, size, offset, type_, name_bytes, board_id_bytes):
+        self.size = size
+        self.offset = offset
+        self.type = type_
         self.name = name_bytes.rstrip(b'\x00').decode('utf-8', errors='ignore')
-        board_id_bytes = data[12+VENDOR_RAMDISK_NAME_SIZE:12+VENDOR_RAMDISK_NAME_SIZE+BOOT_ID_SIZE]
         self.board_id = board_id_bytes.hex()
-        self.type_str = {
-            VENDOR_RAMDISK_TYPE_NONE: "none",
-            VENDOR_RAMDISK_TYPE_PLATFORM: "platform",
-            VENDOR_RAMDISK_TYPE_RECOVERY: "recovery",
-            VENDOR_RAMDISK_TYPE_DLKM: "dlkm"
-        }.get(self.type, f"unknown({self.type})")
+        if 0 <= self.type < len(_TYPE_NAMES):
+            self.type_str = _TYPE_NAMES[self.type]
+        else:
+            self.type_str = f"unknown({self.type})"
 
 def parse_vendor_boot(img_path):
     with open(img_path, 'rb') as f:
-        data = f.read()
-    log.info(f"Read {len(data)} bytes from {img_path}")
-    header = VendorBootHeader(data)
-    entries = header.get_ramdisk_entries()
-    log.info(f"Found {len(entries)} vendor ramdisk entries")
-    return {'header': header, 'entries': entries, 'data': data}
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    data = memoryview(mm)
+    log.info("Mapped %d bytes from %s", len(data), img_path)
+    try:
+        header = VendorBootHeader(data)
+        entries = header.get_ramdisk_entries()
+    except Exception:
+        data.release()
+        mm.close()
+        raise
+    log.info("Found %d vendor ramdisk entries", len(entries))
+    # Keep the mmap alive alongside the views into it; the consumer closes
+    # it once the slices have been written out.
+    return {'header': header, 'entries': entries, 'data': data, 'mm': mm}
 
 # -------------------- Directory‑based extraction --------------------
 def load_from_directory(dir_path):
     # ... (same as PBRP) ...
-    log.info(f"Loading unpacked vendor_boot from directory: {dir_path}")
+    log.info("Loading unpacked vendor_boot from directory: %s", dir_path)
     ramdisk_dir = os.path.join(dir_path, 'ramdisk')
     ramdisk_cpio = os.path.join(dir_path, 'ramdisk.cpio')
     if os.path.isdir(ramdisk_dir):
@@ -191,7 +211,7 @@ def load_from_directory(dir_path):
                 if '=' in line:
                     k, v = line.split('=', 1)
                     header_props[k.strip()] = v.strip()
-        log.info(f"Loaded header with {len(header_props)} properties")
+        log.info("Loaded header with %d properties", len(header_props))
 
     class MockHeader:
         def __init__(self, props):
@@ -221,117 +241,130 @@ def extract_cpio(cpio_file, dest_dir):
     if not os.path.isfile(cpio_file):
         raise FileNotFoundError(f"cpio file not found: {cpio_file}")
     os.makedirs(dest_dir, exist_ok=True)
+    # Read the archive once and walk it with an offset cursor; memoryview
+    # slices let file bodies go straight from the buffer to write() without
+    # per-entry bytes copies. The gzip magic is sniffed from the buffer, so
+    # one open covers both the check and the parse, and gzipped archives
+    # are decompressed in place — no temp file round-trip through the disk.
     with open(cpio_file, 'rb') as f:
-        magic = f.read(2)
-        f.seek(0)
-        if magic == b'\x1f\x8b':
-            import gzip
-            log.info("cpio file is gzipped, decompressing...")
-            try:
-                with gzip.open(cpio_file, 'rb') as gz:
-                    data = gz.read()
-                temp_cpio = os.path.join(os.path.dirname(dest_dir), 'ramdisk_decompressed.cpio')
-                with open(temp_cpio, 'wb') as tf:
-                    tf.write(data)
-                cpio_file = temp_cpio
-            except Exception as e:
-                log.error(f"Failed to decompress gzip: {e}")
-                return
-
-    with open(cpio_file, 'rb') as f:
-        while True:
-            header = f.read(110)
-            if len(header) < 110:
-                break
-            magic = header[0:6].decode('ascii')
-            if magic not in ('070701', '070702'):
-                log.warning(f"Unexpected cpio magic {magic} at offset {f.tell()-110}. Stopping extraction.")
-                break
-            inode = int(header[6:14], 16)
-            mode = int(header[14:22], 16)
-            uid = int(header[22:30], 16)
-            gid = int(header[30:38], 16)
-            nlink = int(header[38:46], 16)
-            mtime = int(header[46:54], 16)
-            filesize = int(header[54:62], 16)
-            devmajor = int(header[62:70], 16)
-            devminor = int(header[70:78], 16)
-            rdevmajor = int(header[78:86], 16)
-            rdevminor = int(header[86:94], 16)
-            namesize = int(header[94:102], 16)
-            check = int(header[102:110], 16)
-
-            filename_raw = f.read(namesize)
-            padding = (4 - (namesize % 4)) % 4
-            f.read(padding)
-            filename = filename_raw.rstrip(b'\x00').decode('utf-8', errors='ignore')
-
-            if filename == 'TRAILER!!!':
-                break
-
-            full_path = os.path.join(dest_dir, filename.lstrip('/'))
-            if filesize == 0:
-                if stat.S_ISDIR(mode):
-                    os.makedirs(full_path, exist_ok=True)
-                elif stat.S_ISLNK(mode):
-                    link_target = f.read(filesize).decode('utf-8', errors='ignore')
-                    os.symlink(link_target, full_path)
-                    pad = (4 - (filesize % 4)) % 4
-                    f.read(pad)
-                else:
-                    os.makedirs(os.path.dirname(full_path), exist_ok=True)
-                    open(full_path, 'wb').close()
+        buf = f.read()
+
+    if buf[:2] == b'\x1f\x8b':
+        import gzip
+        log.info("cpio file is gzipped, decompressing...")
+        try:
+            buf = gzip.decompress(buf)
+        except Exception as e:
+            log.error("Failed to decompress gzip: %s", e)
+            return
+    mv = memoryview(buf)
+    size = len(buf)
+    off = 0
+
+    # Bind the per-entry callables once; the loop body otherwise re-resolves
+    # them for every archive member.
+    unpack_hdr = _CPIO_HDR.unpack_from
+    join = os.path.join
+    dirname = os.path.dirname
+
+    # makedirs stats every path component; cache directories already
+    # created so directory-heavy archives don't redo the walk per file.
+    seen_dirs = {dest_dir}
+
+    def ensure_dir(d):
+        if d not in seen_dirs:
+            os.makedirs(d, exist_ok=True)
+            seen_dirs.add(d)
+
+    while size - off >= 110:
+        fields = unpack_hdr(buf, off)
+        if fields[0] not in (b'070701', b'070702'):
+            log.warning("Unexpected cpio magic %s at offset %d. Stopping extraction.", fields[0], off)
+            break
+        # Only mode, filesize and namesize are needed; skip converting
+        # inode/uid/gid/nlink/mtime/dev*/check.
+        mode = int(fields[2], 16)
+        filesize = int(fields[7], 16)
+        namesize = int(fields[12], 16)
+        off += 110
+
+        filename = bytes(mv[off:off+namesize]).rstrip(b'\x00').decode('utf-8', errors='ignore')
+        off += namesize + (4 - (namesize % 4)) % 4
+
+        if filename == 'TRAILER!!!':
+            break
+
+        full_path = join(dest_dir, filename.lstrip('/'))
+        parent = dirname(full_path)
+        if filesize == 0:
+            if stat.S_ISDIR(mode):
+                ensure_dir(full_path)
+            elif stat.S_ISLNK(mode):
+                os.symlink('', full_path)
             else:
-                data = f.read(filesize)
-                os.makedirs(os.path.dirname(full_path), exist_ok=True)
-                with open(full_path, 'wb') as out_f:
-                    out_f.write(data)
-                pad = (4 - (filesize % 4)) % 4
-                f.read(pad)
-    log.info(f"Extracted cpio to {dest_dir}")
+                ensure_dir(parent)
+                open(full_path, 'wb').close()
+        else:
+            ensure_dir(parent)
+            with open(full_path, 'wb') as out_f:
+                out_f.write(mv[off:off+filesize])
+            off += filesize + (4 - (filesize % 4)) % 4
+    log.info("Extracted cpio to %s", dest_dir)
 
 # -------------------- Touch Patch Function --------------------
 def patch_adaptive_ts(module_path):
     # ... (same) ...
     if not os.path.isfile(module_path):
-        log.warning(f"adaptive-ts.ko not found at {module_path}, skipping patch.")
+        log.warning("adaptive-ts.ko not found at %s, skipping patch.", module_path)
         return
 
+    # Cheap read-only mmap probe first: an already-patched (or
+    # non-matching) module skips the full read/patch/write cycle.
     with open(module_path, 'rb') as f:
-        data = f.read()
-
-    pattern1_old = b'\x60\x00\x00\x54\x40\x00'
-    pattern1_new = b'\x60\x00\x00\x54\x00\x00'
-    pattern2_old = b'\x20\x00\x80\x52'
-    pattern2_new = b'\x00\x00\x80\x52'
+        if os.fstat(f.fileno()).st_size == 0:
+            log.info("No modifications applied to adaptive-ts.ko.")
+            return
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if mm.rfind(_TS_PAT1_OLD) < 0 and mm.find(_TS_PAT2_OLD) < 0:
+                log.info("No patch patterns found in adaptive-ts.ko, nothing to do.")
+                return
+        finally:
+            mm.close()
 
-    modified = False
-    new_data = data
+    with open(module_path, 'rb') as f:
+        data = bytearray(f.read())
 
-    last_pos = new_data.rfind(pattern1_old)
+    # bytes.rfind/find already run as single C-level memory scans, so the
+    # two lookups stay as-is. Old and new patterns are the same length,
+    # making the patches in-place slice assignments rather than copies.
+    last_pos = data.rfind(_TS_PAT1_OLD)
     if last_pos != -1:
-        log.info(f"Found pattern1 at offset 0x{last_pos:x}, replacing.")
-        new_data = new_data[:last_pos] + pattern1_new + new_data[last_pos+len(pattern1_old):]
-        modified = True
-        search_start = last_pos + len(pattern1_new)
+        log.info("Found pattern1 at offset 0x%x, replacing.", last_pos)
+        data[last_pos:last_pos+len(_TS_PAT1_OLD)] = _TS_PAT1_NEW
+        search_start = last_pos + len(_TS_PAT1_NEW)
     else:
         log.warning("Pattern1 (600000544000) not found, skipping first patch.")
         search_start = 0
 
-    if search_start < len(new_data):
-        pos2 = new_data.find(pattern2_old, search_start)
-        if pos2 != -1:
-            log.info(f"Found pattern2 at offset 0x{pos2:x} after patch location, replacing.")
-            new_data = new_data[:pos2] + pattern2_new + new_data[pos2+len(pattern2_old):]
-            modified = True
-        else:
-            log.warning("Pattern2 (20008052) not found after patch location, skipping second patch.")
+    # find() with a start at or past the end just returns -1, so no
+    # bounds guard is needed.
+    pos2 = data.find(_TS_PAT2_OLD, search_start)
+    if pos2 != -1:
+        log.info("Found pattern2 at offset 0x%x after patch location, replacing.", pos2)
+        data[pos2:pos2+len(_TS_PAT2_OLD)] = _TS_PAT2_NEW
     else:
-        log.warning("Search start beyond file end, skipping second patch.")
+        log.warning("Pattern2 (20008052) not found after patch location, skipping second patch.")
+
+    modified = (last_pos >= 0) or (pos2 >= 0)
 
     if modified:
-        with open(module_path, 'wb') as f:
-            f.write(new_data)
+        # Write-and-rename instead of truncating in place: the module may be
+        # a hardlink into the extraction tree and must not be patched there.
+        tmp_path = module_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, module_path)
         log.info("adaptive-ts.ko patched successfully.")
     else:
         log.info("No modifications applied to adaptive-ts.ko.")
@@ -345,31 +378,118 @@ def human_readable_size(size_bytes):
     return f"{size_bytes:.2f} TB"
 
 def parse_prop_file(prop_path):
-    props = {}
     if not os.path.isfile(prop_path):
-        return props
-    with open(prop_path, 'r', encoding='utf-8', errors='ignore') as f:
-        for line in f:
-            line = line.strip()
-            if not line or line.startswith('#'):
-                continue
-            if '=' in line:
-                key, value = line.split('=', 1)
-                props[key.strip()] = value.strip()
-    return props
-
-def collect_all_props(base_dir):
-    all_props = {}
+        return {}
+    with open(prop_path, 'rb') as f:
+        text = f.read().decode('utf-8', errors='ignore')
+    return {m.group(1): m.group(2) for m in _PROP_RE.finditer(text)}
+
+def _fast_copy(src, dst):
+    """Copy src to dst, cheapest mechanism first: a hardlink (zero bytes
+    copied), then an in-kernel copy_file_range loop, then shutil.copy2."""
+    try:
+        os.link(src, dst)
+        return
+    except FileExistsError:
+        # dst may be a hardlink from a previous run; unlink rather than
+        # truncate in place, which would clobber the shared inode.
+        os.unlink(dst)
+        try:
+            os.link(src, dst)
+            return
+        except OSError:
+            pass
+    except OSError:
+        pass
+    import shutil  # only needed on the non-hardlink fallback paths
+    try:
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            remaining = os.fstat(fsrc.fileno()).st_size
+            while remaining > 0:
+                copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                if copied == 0:
+                    break
+                remaining -= copied
+        shutil.copystat(src, dst)
+        return
+    except OSError:
+        pass
+    # copy_file_range can refuse cross-device copies on older kernels;
+    # sendfile still keeps the bytes in the kernel there.
+    try:
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            size = os.fstat(fsrc.fileno()).st_size
+            offset = 0
+            while offset < size:
+                sent = os.sendfile(fdst.fileno(), fsrc.fileno(), offset, size - offset)
+                if sent == 0:
+                    break
+                offset += sent
+        shutil.copystat(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+def _fast_copytree(src, dst):
+    """shutil.copytree(symlinks=True, dirs_exist_ok=True) replacement built
+    on _fast_copy, so unchanged files become hardlinks instead of byte
+    copies when src and dst share a filesystem."""
+    os.makedirs(dst, exist_ok=True)
+    with os.scandir(src) as it:
+        for entry in it:
+            target = os.path.join(dst, entry.name)
+            if entry.is_symlink():
+                link_target = os.readlink(entry.path)
+                try:
+                    os.symlink(link_target, target)
+                except FileExistsError:
+                    os.unlink(target)
+                    os.symlink(link_target, target)
+            elif entry.is_dir(follow_symlinks=False):
+                _fast_copytree(entry.path, target)
+            else:
+                _fast_copy(entry.path, target)
+
+def _write_text(path, content):
+    """Write fully-built text as UTF-8 bytes in one call, skipping the
+    TextIOWrapper incremental-encode layer."""
+    with open(path, 'wb') as f:
+        f.write(content.encode('utf-8'))
+
+def _walk_files(base_dir):
+    """Yield DirEntry objects for every file under base_dir.
+
+    scandir-based so is_dir/is_file reuse the stat data readdir already
+    returned, unlike os.walk which stats each entry again. Matches
+    os.walk semantics: symlinks to directories are not followed, but
+    symlinks to files (common in Android ramdisks, e.g.
+    default.prop -> prop.real) are yielded.
+    """
+    stack = [base_dir]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file():
+                    yield entry
+
+def _scan_ramdisk(base_dir):
+    """Single traversal of the ramdisk collecting everything _post_extract
+    needs: prop files, the stock recovery.fstab and init .rc files."""
+    prop_files = []
+    fstab_path = None
+    rc_files = []
     if not os.path.isdir(base_dir):
-        return all_props
-    for root, dirs, files in os.walk(base_dir):
-        for file in files:
-            if file.endswith('.prop') or file in ('build.prop', 'default.prop'):
-                path = os.path.join(root, file)
-                props = parse_prop_file(path)
-                all_props.update(props)
-    log.info(f"Collected {len(all_props)} properties from ramdisk")
-    return all_props
+        return prop_files, fstab_path, rc_files
+    for entry in _walk_files(base_dir):
+        name = entry.name
+        if name.endswith('.prop') or name in ('build.prop', 'default.prop'):
+            prop_files.append(entry.path)
+        if name.endswith('.rc'):
+            rc_files.append(entry.path)
+        if fstab_path is None and name == 'recovery.fstab':
+            fstab_path = entry.path
+    return prop_files, fstab_path, rc_files
 
 def detect_platform(board_name):
     if board_name and board_name.startswith('mt'):
@@ -402,6 +522,7 @@ class DeviceInfo:
 
         self.recovery_ramdisk_dir = None
         self.dtb_path = None
+        self.dtb_size = None             # resolved once in _post_extract
         self.props = {}
         self.board_name = None
         self.device_name = None          # e.g., Infinix-X6885
@@ -424,17 +545,22 @@ class DeviceInfo:
         if self.from_directory:
             self._extract_from_directory()
         else:
-            self._extract_from_image()
+            # Release from here, after _extract_from_image's frame (and any
+            # slices it held) is gone, and on its error paths too.
+            try:
+                self._extract_from_image()
+            finally:
+                self._release_image()
+            self._post_extract()
 
     def _extract_from_image(self):
         if self.header.dtb_size > 0:
             dtb_offset = self.header.get_dtb_offset()
-            dtb_data = self.data[dtb_offset:dtb_offset+self.header.dtb_size]
             dtb_path = os.path.join(self.work_dir, 'dtb.img')
             with open(dtb_path, 'wb') as f:
-                f.write(dtb_data)
+                f.write(self.data[dtb_offset:dtb_offset+self.header.dtb_size])
             self.dtb_path = dtb_path
-            log.info(f"DTB extracted")
+            log.info("DTB extracted")
 
         for entry in self.entries:
             cpio_file = os.path.join(self.work_dir, f"ramdisk_{entry.name or entry.type_str}.cpio")
@@ -451,7 +577,17 @@ class DeviceInfo:
             log.warning("No dedicated recovery ramdisk, using first ramdisk.")
         if not self.recovery_ramdisk_dir:
             raise RuntimeError("No recovery ramdisk found.")
-        self._post_extract()
+
+    def _release_image(self):
+        # Release all views before closing the underlying mmap.
+        self.data = None
+        self.header.data = None
+        data = self.parse_result.get('data')
+        if isinstance(data, memoryview):
+            data.release()
+        mm = self.parse_result.get('mm')
+        if mm is not None:
+            mm.close()
 
     def _extract_from_directory(self):
         log.info("Extracting from unpacked directory...")
@@ -461,20 +597,28 @@ class DeviceInfo:
             self.recovery_ramdisk_dir = dest_dir
         else:
             dest_dir = os.path.join(self.work_dir, 'recovery_ramdisk')
-            shutil.copytree(self.ramdisk_source, dest_dir, symlinks=True)
+            _fast_copytree(self.ramdisk_source, dest_dir)
             self.recovery_ramdisk_dir = dest_dir
         if self.dtb_path_input:
             dtb_dest = os.path.join(self.work_dir, 'dtb.img')
-            shutil.copy2(self.dtb_path_input, dtb_dest)
+            _fast_copy(self.dtb_path_input, dtb_dest)
             self.dtb_path = dtb_dest
         self._post_extract()
 
     def _post_extract(self):
-        self.props = collect_all_props(self.recovery_ramdisk_dir)
+        # Stat the dtb once; generators read the cached size. 209018 is the
+        # historical fallback used when no dtb was found.
+        self.dtb_size = os.stat(self.dtb_path).st_size if self.dtb_path else 209018
+
+        prop_files, fstab_source, rc_files = _scan_ramdisk(self.recovery_ramdisk_dir)
+        self.props = {}
+        for prop_path in prop_files:
+            self.props.update(parse_prop_file(prop_path))
+        log.info("Collected %d properties from ramdisk", len(self.props))
 
         if self.manual_device_name:
             self.device_name = self.manual_device_name
-            log.info(f"Using manually specified device name: {self.device_name}")
+            log.info("Using manually specified device name: %s", self.device_name)
         else:
             self.device_name = (self.props.get('ro.product.system.device') or
                                 self.props.get('ro.product.vendor.device') or
@@ -521,33 +665,28 @@ class DeviceInfo:
                 self.kernel_path = k
                 break
 
-        for root, dirs, files in os.walk(self.recovery_ramdisk_dir):
-            if 'recovery.fstab' in files:
-                fstab_path = os.path.join(root, 'recovery.fstab')
-                with open(fstab_path, 'r') as f:
-                    self.fstab_content = f.read()
-                break
+        if fstab_source:
+            with open(fstab_source, 'r') as f:
+                self.fstab_content = f.read()
 
         init_dest = os.path.join(self.work_dir, 'recovery_root_src')
         os.makedirs(init_dest, exist_ok=True)
-        for root, dirs, files in os.walk(self.recovery_ramdisk_dir):
-            for file in files:
-                if file.endswith('.rc') or file in ('ueventd.rc', 'init.recovery.*'):
-                    src = os.path.join(root, file)
-                    rel = os.path.relpath(src, self.recovery_ramdisk_dir)
-                    dst = os.path.join(init_dest, rel)
-                    os.makedirs(os.path.dirname(dst), exist_ok=True)
-                    shutil.copy2(src, dst)
-        if os.listdir(init_dest):
+        for src in rc_files:
+            rel = os.path.relpath(src, self.recovery_ramdisk_dir)
+            dst = os.path.join(init_dest, rel)
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            _fast_copy(src, dst)
+        init_entries = os.listdir(init_dest)
+        if init_entries:
             self.init_files_source = init_dest
-            log.info(f"Collected {len(os.listdir(init_dest))} init files")
+            log.info("Collected %d init files", len(init_entries))
 
         modules_src = os.path.join(self.recovery_ramdisk_dir, 'lib', 'modules')
         if os.path.isdir(modules_src):
             modules_dest = os.path.join(self.work_dir, 'modules_src')
-            shutil.copytree(modules_src, modules_dest, symlinks=True)
+            _fast_copytree(modules_src, modules_dest)
             self.modules_source = modules_dest
-            log.info(f"Collected modules from lib/modules")
+            log.info("Collected modules from lib/modules")
 
         system_etc_src = os.path.join(self.recovery_ramdisk_dir, 'system', 'etc')
         if os.path.isdir(system_etc_src):
@@ -557,14 +696,15 @@ class DeviceInfo:
             for item in os.listdir(system_etc_src):
                 src_path = os.path.join(system_etc_src, item)
                 if os.path.isdir(src_path) and item == 'vintf':
-                    shutil.copytree(src_path, os.path.join(etc_dest_base, 'vintf'), symlinks=True, dirs_exist_ok=True)
+                    _fast_copytree(src_path, os.path.join(etc_dest_base, 'vintf'))
                     log.info("Copied vintf/")
                 elif item in wanted and os.path.isfile(src_path):
-                    shutil.copy2(src_path, os.path.join(etc_dest_base, item))
-                    log.info(f"Copied {item}")
-            if os.listdir(etc_dest_base):
+                    _fast_copy(src_path, os.path.join(etc_dest_base, item))
+                    log.info("Copied %s", item)
+            etc_entries = os.listdir(etc_dest_base)
+            if etc_entries:
                 self.system_etc_source = etc_dest_base
-                log.info(f"Collected system/etc files: {os.listdir(etc_dest_base)}")
+                log.info("Collected system/etc files: %s", etc_entries)
 
         if self.fstab_content and 'super' in self.fstab_content:
             self.dynamic_partitions = True
@@ -577,183 +717,27 @@ class DeviceInfo:
         log.info("="*50)
         log.info("COLLECTED DEVICE INFORMATION")
         log.info("="*50)
-        log.info(f"Device name          : {self.device_name}")
-        log.info(f"Codename             : {self.codename}")
-        log.info(f"Board name           : {self.board_name}")
-        log.info(f"Manufacturer         : {self.manufacturer}")
-        log.info(f"Platform             : {self.platform}")
-        log.info(f"Architecture         : {self.arch}")
-        log.info(f"Android SDK version  : {self.sdk_version}")
-        log.info(f"Kernel version       : {self.kernel_version}")
-        log.info(f"Boot header version  : {self.boot_header_version}")
-        log.info(f"Dynamic partitions   : {self.dynamic_partitions}")
-        log.info(f"Kernel found         : {self.kernel_path is not None}")
-        log.info(f"Stock fstab found    : {self.fstab_content is not None}")
-        log.info(f"Init files collected : {self.init_files_source is not None}")
-        log.info(f"Modules collected    : {self.modules_source is not None}")
-        log.info(f"System/etc collected : {self.system_etc_source is not None}")
+        log.info("Device name          : %s", self.device_name)
+        log.info("Codename             : %s", self.codename)
+        log.info("Board name           : %s", self.board_name)
+        log.info("Manufacturer         : %s", self.manufacturer)
+        log.info("Platform             : %s", self.platform)
+        log.info("Architecture         : %s", self.arch)
+        log.info("Android SDK version  : %s", self.sdk_version)
+        log.info("Kernel version       : %s", self.kernel_version)
+        log.info("Boot header version  : %s", self.boot_header_version)
+        log.info("Dynamic partitions   : %s", self.dynamic_partitions)
+        log.info("Kernel found         : %s", self.kernel_path is not None)
+        log.info("Stock fstab found    : %s", self.fstab_content is not None)
+        log.info("Init files collected : %s", self.init_files_source is not None)
+        log.info("Modules collected    : %s", self.modules_source is not None)
+        log.info("System/etc collected : %s", self.system_etc_source is not None)
         log.info("="*50)
 
 # -------------------- Device Tree Generator (TWRP) --------------------
-class DeviceTreeGenerator:
-    def __init__(self, info, output_dir):
-        self.info = info
-        self.output_dir = output_dir
-        self.device_path = None
-
-    def generate(self):
-        if not self.info.device_name:
-            log.error("Device name not found. Cannot generate tree.")
-            sys.exit(1)
-
-        self.device_path = os.path.join(self.output_dir, self.info.manufacturer, self.info.codename)
-        os.makedirs(self.device_path, exist_ok=True)
-
-        subdirs = ['bootctrl', 'init', 'mtk_plpath_utils', 'prebuilt', 'recovery/root']
-        for d in subdirs:
-            os.makedirs(os.path.join(self.device_path, d), exist_ok=True)
-
-        if self.info.kernel_path:
-            shutil.copy2(self.info.kernel_path, os.path.join(self.device_path, 'prebuilt', 'kernel'))
-            log.info("Kernel copied to prebuilt/")
-        if self.info.dtb_path:
-            shutil.copy2(self.info.dtb_path, os.path.join(self.device_path, 'prebuilt', 'dtb.img'))
-            log.info("DTB copied to prebuilt/dtb.img")
-
-        self._generate_init_files()
-        self._populate_recovery_root()
-        self._generate_android_mk()
-        self._generate_android_products_mk()
-        self._generate_boardconfig_mk()
-        self._generate_device_mk()
-        self._generate_product_mk()
-        self._generate_system_prop()
-        self._generate_vendorsetup()
-        self._generate_readme()
-
-        log.info(f"Device tree generated at: {self.device_path}")
-
-    def _generate_init_files(self):
-        cpp_filename = f"init_{self.info.device_name}.cpp"
-        bp_path = os.path.join(self.device_path, 'init', 'Android.bp')
-        cpp_path = os.path.join(self.device_path, 'init', cpp_filename)
-
-        with open(bp_path, 'w') as f:
-            f.write(f"""cc_library_static {{
-    name: "libinit_{self.info.device_name}",
-    header_libs: [
-        "libbase_headers",
-    ],
-    cflags: [
-        "-Wall",
-    ],
-    static_libs: [
-        "libbase",
-    ],
-    srcs: ["{cpp_filename}"],
-    recovery_available: true,
-}}
-""")
-
-        with open(cpp_path, 'w') as f:
-            f.write(f"""#include <stdlib.h>
-#include <string.h>
-#include <unistd.h>
-#include <android-base/properties.h>
-
-#define _REALLY_INCLUDE_SYS__SYSTEM_PROPERTIES_H_
-#include <sys/_system_properties.h>
-
-using android::base::GetProperty;
-using std::string;
-
-void property_override(string prop, string value)
-{{
-    auto pi = (prop_info *)__system_property_find(prop.c_str());
-
-    if (pi != nullptr)
-        __system_property_update(pi, value.c_str(), value.size());
-    else
-        __system_property_add(prop.c_str(), prop.size(), value.c_str(), value.size());
-}}
-
-void vendor_load_properties()
-{{
-    string prop_partitions[] = {{"", "vendor.", "odm."}};
-    for (const string &prop : prop_partitions)
-    {{
-        property_override(string("ro.product.") + prop + string("brand"), "{self.info.manufacturer.capitalize()}");
-        property_override(string("ro.product.") + prop + string("name"), "{self.info.codename}-OP");
-        property_override(string("ro.product.") + prop + string("device"), "{self.info.device_name}");
-        property_override(string("ro.product.") + prop + string("model"), "{self.info.manufacturer.capitalize()} {self.info.codename}");
-        property_override(string("ro.product.") + prop + string("marketname"), "{self.info.manufacturer.capitalize()} HOT 60 PRO");
-        property_override(string("ro.product.system.") + prop + string("device"), "{self.info.manufacturer.capitalize()} HOT 60 PRO");
-    }}
-}}
-""")
-        log.info("Generated init files")
-
-    def _populate_recovery_root(self):
-        recovery_root = os.path.join(self.device_path, 'recovery', 'root')
-
-        if self.info.init_files_source:
-            shutil.copytree(self.info.init_files_source, recovery_root, dirs_exist_ok=True, symlinks=True)
-            log.info("Copied init files to recovery/root")
-
-        fs_ramdisk = os.path.join(recovery_root, 'first_stage_ramdisk')
-        os.makedirs(fs_ramdisk, exist_ok=True)
-        for root, dirs, files in os.walk(self.info.recovery_ramdisk_dir):
-            for f in files:
-                if f.startswith('fstab.') or f == 'fstab':
-                    src = os.path.join(root, f)
-                    rel = os.path.relpath(src, self.info.recovery_ramdisk_dir)
-                    if rel.startswith('first_stage_ramdisk/'):
-                        dst = os.path.join(fs_ramdisk, os.path.basename(rel))
-                    else:
-                        dst = os.path.join(fs_ramdisk, f)
-                    shutil.copy2(src, dst)
-                    log.info(f"Copied fstab file {f} to first_stage_ramdisk/")
-        if not os.listdir(fs_ramdisk):
-            default_fstab = os.path.join(fs_ramdisk, f'fstab.{self.info.board_name}')
-            with open(default_fstab, 'w') as f:
-                f.write("# Default fstab for {}\n".format(self.info.board_name))
-                f.write("# Add your mount points here\n")
-            log.warning(f"No fstab found; created placeholder {default_fstab}")
-
-        if self.info.modules_source:
-            modules_dest = os.path.join(recovery_root, 'lib', 'modules')
-            shutil.copytree(self.info.modules_source, modules_dest, dirs_exist_ok=True, symlinks=True)
-            log.info("Copied modules to recovery/root/lib/modules")
-            adaptive_ts_path = os.path.join(modules_dest, 'adaptive-ts.ko')
-            patch_adaptive_ts(adaptive_ts_path)
-
-        if self.info.system_etc_source:
-            etc_dest = os.path.join(recovery_root, 'system', 'etc')
-            shutil.copytree(self.info.system_etc_source, etc_dest, dirs_exist_ok=True, symlinks=True)
-            log.info("Copied system/etc files")
-
-        if self.info.fstab_content:
-            etc_dest = os.path.join(recovery_root, 'system', 'etc')
-            os.makedirs(etc_dest, exist_ok=True)
-            fstab_dest = os.path.join(etc_dest, 'recovery.fstab')
-            with open(fstab_dest, 'w') as f:
-                f.write(self.info.fstab_content)
-            log.info("Placed recovery.fstab in recovery/root/system/etc/")
-        else:
-            etc_dest = os.path.join(recovery_root, 'system', 'etc')
-            os.makedirs(etc_dest, exist_ok=True)
-            default_fstab = os.path.join(etc_dest, 'recovery.fstab')
-            with open(default_fstab, 'w') as f:
-                f.write("# Default recovery.fstab\n")
-                f.write("/dev/block/platform/bootdevice/by-name/system    /system    ext4    ro    wait\n")
-                f.write("/dev/block/platform/bootdevice/by-name/vendor    /vendor    ext4    ro    wait\n")
-                f.write("/dev/block/platform/bootdevice/by-name/userdata  /data      ext4    rw    wait,check\n")
-            log.info("Generated default recovery.fstab in system/etc/")
-
-    def _generate_android_mk(self):
-        path = os.path.join(self.device_path, 'Android.mk')
-        with open(path, 'w') as f:
-            f.write("""#
+# Makefile templates, hoisted to module scope so each run formats the
+# interned literal instead of rebuilding it per call.
+_ANDROID_MK_TPL = """#
 # Copyright (C) 2022 The LineageOS Project
 #
 # SPDX-License-Identifier: Apache-2.0
@@ -766,13 +750,9 @@ ifeq ($(TARGET_DEVICE), {device})
 include $(call all-subdir-makefiles,$(LOCAL_PATH))
 
 endif
-""".format(device=self.info.device_name))
-        log.info("Android.mk generated")
+"""
 
-    def _generate_android_products_mk(self):
-        path = os.path.join(self.device_path, 'AndroidProducts.mk')
-        with open(path, 'w') as f:
-            f.write("""#
+_PRODUCTS_MK_TPL = """#
 # Copyright (C) 2022 The LineageOS Project
 #
 # SPDX-License-Identifier: Apache-2.0
@@ -785,19 +765,9 @@ COMMON_LUNCH_CHOICES := \\
 	twrp_{codename}-eng \\
 	twrp_{codename}-userdebug \\
 	twrp_{codename}-user
-""".format(codename=self.info.codename))
-        log.info("AndroidProducts.mk generated")
-
-    def _generate_boardconfig_mk(self):
-        kernel_base = getattr(self.info.header, 'kernel_load_addr', '0x3fff8000')
-        kernel_offset = getattr(self.info.header, 'kernel_offset', '0x00008000')
-        tags_offset = getattr(self.info.header, 'tags_load_addr', '0x07c88000')
-        page_size = getattr(self.info.header, 'page_size', 4096)
-        dtb_offset = getattr(self.info.header, 'dtb_load_addr', '0x07c88000')
-        vendor_cmdline = getattr(self.info.header, 'cmdline', 'bootopt=64S3,32N2,64N2')
-        path = os.path.join(self.device_path, 'BoardConfig.mk')
-        with open(path, 'w') as f:
-            f.write("""#
+"""
+
+_BOARDCONFIG_TPL = """#
 # Copyright (C) 2022 The LineageOS Project
 #
 # SPDX-License-Identifier: Apache-2.0
@@ -970,27 +940,9 @@ TARGET_RECOVERY_DEVICE_MODULES := libinit_{device_name}
 
 # Maintainer (optional)
 TW_MAINTAINER := "アンドレイ"
-""".format(
-                manufacturer=self.info.manufacturer,
-                codename=self.info.codename,
-                arch=self.info.arch.split('-')[0],
-                boot_header_version=self.info.boot_header_version,
-                kernel_base=kernel_base,
-                kernel_offset=kernel_offset,
-                tags_offset=tags_offset,
-                page_size=page_size,
-                dtb_size=os.path.getsize(self.info.dtb_path) if self.info.dtb_path else 209018,
-                dtb_offset=dtb_offset,
-                vendor_cmdline=vendor_cmdline,
-                board_platform=self.info.board_name,
-                device_name=self.info.device_name,
-            ))
-        log.info("BoardConfig.mk generated")
-
-    def _generate_device_mk(self):
-        path = os.path.join(self.device_path, 'device.mk')
-        with open(path, 'w') as f:
-            f.write("""#
+"""
+
+_DEVICE_MK_TPL = """#
 # Copyright (C) 2022 The LineageOS Project
 #
 # SPDX-License-Identifier: Apache-2.0
@@ -1105,13 +1057,9 @@ TW_RECOVERY_ADDITIONAL_RELINK_LIBRARY_FILES += \\
 
 TARGET_RECOVERY_DEVICE_MODULES += \\
     android.hardware.keymaster@4.1
-""")
-        log.info("device.mk generated")
+"""
 
-    def _generate_product_mk(self):
-        path = os.path.join(self.device_path, f'twrp_{self.info.codename}.mk')
-        with open(path, 'w') as f:
-            f.write("""#
+_PRODUCT_MK_TPL = """#
 # Copyright (C) 2022 The LineageOS Project
 #
 # SPDX-License-Identifier: Apache-2.0
@@ -1131,20 +1079,223 @@ PRODUCT_MODEL := {brand} {codename}
 PRODUCT_MANUFACTURER := {brand_upper}
 
 PRODUCT_GMS_CLIENTID_BASE := android-{brand_lower}
-""".format(
-                device=self.info.device_name,
-                manufacturer=self.info.manufacturer,
-                codename=self.info.codename,
-                brand=self.info.manufacturer.capitalize(),
-                brand_upper=self.info.manufacturer.upper(),
-                brand_lower=self.info.manufacturer.lower(),
-            ))
-        log.info(f"twrp_{self.info.codename}.mk generated")
+"""
+
+# (filename template, content template) — rendered in one loop from a
+# shared namespace dict. Files whose content is not a plain template
+# (init sources, system.prop, vendorsetup.sh, README, recovery/root)
+# keep dedicated generators.
+_FILES = (
+    ('Android.mk', _ANDROID_MK_TPL),
+    ('AndroidProducts.mk', _PRODUCTS_MK_TPL),
+    ('BoardConfig.mk', _BOARDCONFIG_TPL),
+    ('device.mk', _DEVICE_MK_TPL),
+    ('twrp_{codename}.mk', _PRODUCT_MK_TPL),
+)
+
+class DeviceTreeGenerator:
+    def __init__(self, info, output_dir):
+        self.info = info
+        self.output_dir = output_dir
+        self.device_path = None
+
+    def generate(self):
+        if not self.info.device_name:
+            log.error("Device name not found. Cannot generate tree.")
+            sys.exit(1)
+
+        self.device_path = os.path.join(self.output_dir, self.info.manufacturer, self.info.codename)
+        os.makedirs(self.device_path, exist_ok=True)
+
+        subdirs = ['bootctrl', 'init', 'mtk_plpath_utils', 'prebuilt', 'recovery/root']
+        for d in subdirs:
+            os.makedirs(os.path.join(self.device_path, d), exist_ok=True)
+
+        if self.info.kernel_path:
+            _fast_copy(self.info.kernel_path, os.path.join(self.device_path, 'prebuilt', 'kernel'))
+            log.info("Kernel copied to prebuilt/")
+        if self.info.dtb_path:
+            _fast_copy(self.info.dtb_path, os.path.join(self.device_path, 'prebuilt', 'dtb.img'))
+            log.info("DTB copied to prebuilt/dtb.img")
+
+        # Each generator writes an independent file (or subtree) under
+        # device_path, so run them on a thread pool — file writes release
+        # the GIL. The recovery/root population is the longest task and is
+        # submitted first. The makefiles all render from one shared
+        # namespace dict built once up front.
+        ns = self._build_namespace()
+        tasks = [
+            self._populate_recovery_root,
+            self._generate_init_files,
+            self._generate_system_prop,
+            self._generate_vendorsetup,
+            self._generate_readme,
+        ]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            futures = [executor.submit(task) for task in tasks]
+            futures += [executor.submit(self._write_templated, name_tpl, tpl, ns)
+                        for name_tpl, tpl in _FILES]
+            for future in futures:
+                future.result()
+
+        log.info("Device tree generated at: %s", self.device_path)
+
+    def _generate_init_files(self):
+        # Bind the repeatedly interpolated fields once.
+        dev = self.info.device_name
+        code = self.info.codename
+        brand = self.info.manufacturer.capitalize()
+        cpp_filename = f"init_{dev}.cpp"
+        bp_path = os.path.join(self.device_path, 'init', 'Android.bp')
+        cpp_path = os.path.join(self.device_path, 'init', cpp_filename)
+
+        _write_text(bp_path, f"""cc_library_static {{
+    name: "libinit_{dev}",
+    header_libs: [
+        "libbase_headers",
+    ],
+    cflags: [
+        "-Wall",
+    ],
+    static_libs: [
+        "libbase",
+    ],
+    srcs: ["{cpp_filename}"],
+    recovery_available: true,
+}}
+""")
+
+        _write_text(cpp_path, f"""#include <stdlib.h>
+#include <string.h>
+#include <unistd.h>
+#include <android-base/properties.h>
+
+#define _REALLY_INCLUDE_SYS__SYSTEM_PROPERTIES_H_
+#include <sys/_system_properties.h>
+
+using android::base::GetProperty;
+using std::string;
+
+void property_override(string prop, string value)
+{{
+    auto pi = (prop_info *)__system_property_find(prop.c_str());
+
+    if (pi != nullptr)
+        __system_property_update(pi, value.c_str(), value.size());
+    else
+        __system_property_add(prop.c_str(), prop.size(), value.c_str(), value.size());
+}}
+
+void vendor_load_properties()
+{{
+    string prop_partitions[] = {{"", "vendor.", "odm."}};
+    for (const string &prop : prop_partitions)
+    {{
+        property_override(string("ro.product.") + prop + string("brand"), "{brand}");
+        property_override(string("ro.product.") + prop + string("name"), "{code}-OP");
+        property_override(string("ro.product.") + prop + string("device"), "{dev}");
+        property_override(string("ro.product.") + prop + string("model"), "{brand} {code}");
+        property_override(string("ro.product.") + prop + string("marketname"), "{brand} HOT 60 PRO");
+        property_override(string("ro.product.system.") + prop + string("device"), "{brand} HOT 60 PRO");
+    }}
+}}
+""")
+        log.info("Generated init files")
+
+    def _populate_recovery_root(self):
+        join = os.path.join
+        recovery_root = join(self.device_path, 'recovery', 'root')
+        etc_dest = join(recovery_root, 'system', 'etc')
+
+        if self.info.init_files_source:
+            _fast_copytree(self.info.init_files_source, recovery_root)
+            log.info("Copied init files to recovery/root")
+
+        fs_ramdisk = join(recovery_root, 'first_stage_ramdisk')
+        os.makedirs(fs_ramdisk, exist_ok=True)
+        copied_any = False
+        for root, dirs, files in os.walk(self.info.recovery_ramdisk_dir):
+            for f in files:
+                if f.startswith('fstab.') or f == 'fstab':
+                    src = join(root, f)
+                    rel = os.path.relpath(src, self.info.recovery_ramdisk_dir)
+                    if rel.startswith('first_stage_ramdisk/'):
+                        dst = join(fs_ramdisk, os.path.basename(rel))
+                    else:
+                        dst = join(fs_ramdisk, f)
+                    _fast_copy(src, dst)
+                    copied_any = True
+                    log.info("Copied fstab file %s to first_stage_ramdisk/", f)
+        if not copied_any:
+            default_fstab = join(fs_ramdisk, f'fstab.{self.info.board_name}')
+            _write_text(default_fstab,
+                        f"# Default fstab for {self.info.board_name}\n"
+                        "# Add your mount points here\n")
+            log.warning("No fstab found; created placeholder %s", default_fstab)
+
+        if self.info.modules_source:
+            modules_dest = join(recovery_root, 'lib', 'modules')
+            _fast_copytree(self.info.modules_source, modules_dest)
+            log.info("Copied modules to recovery/root/lib/modules")
+            adaptive_ts_path = join(modules_dest, 'adaptive-ts.ko')
+            patch_adaptive_ts(adaptive_ts_path)
+
+        if self.info.system_etc_source:
+            _fast_copytree(self.info.system_etc_source, etc_dest)
+            log.info("Copied system/etc files")
+
+        # Both branches need system/etc; make it once up front (makedirs
+        # rather than mkdir, since the parent may not exist yet either).
+        os.makedirs(etc_dest, exist_ok=True)
+        if self.info.fstab_content:
+            fstab_dest = join(etc_dest, 'recovery.fstab')
+            _write_text(fstab_dest, self.info.fstab_content)
+            log.info("Placed recovery.fstab in recovery/root/system/etc/")
+        else:
+            default_fstab = join(etc_dest, 'recovery.fstab')
+            _write_text(default_fstab,
+                        "# Default recovery.fstab\n"
+                        "/dev/block/platform/bootdevice/by-name/system    /system    ext4    ro    wait\n"
+                        "/dev/block/platform/bootdevice/by-name/vendor    /vendor    ext4    ro    wait\n"
+                        "/dev/block/platform/bootdevice/by-name/userdata  /data      ext4    rw    wait,check\n")
+            log.info("Generated default recovery.fstab in system/etc/")
+
+    def _build_namespace(self):
+        """One namespace dict covering every placeholder used in _FILES.
+
+        Header fields go through one dict lookup each instead of a getattr
+        chain, with the historical defaults as fallbacks.
+        """
+        info = self.info
+        hdr = info.header.__dict__
+        return {
+            'device': info.device_name,
+            'device_name': info.device_name,
+            'manufacturer': info.manufacturer,
+            'codename': info.codename,
+            'brand': info.manufacturer.capitalize(),
+            'brand_upper': info.manufacturer.upper(),
+            'brand_lower': info.manufacturer.lower(),
+            'arch': info.arch.split('-', 1)[0],
+            'boot_header_version': info.boot_header_version,
+            'kernel_base': hdr.get('kernel_load_addr', '0x3fff8000'),
+            'kernel_offset': hdr.get('kernel_offset', '0x00008000'),
+            'tags_offset': hdr.get('tags_load_addr', '0x07c88000'),
+            'page_size': hdr.get('page_size', 4096),
+            'dtb_size': info.dtb_size,
+            'dtb_offset': hdr.get('dtb_load_addr', '0x07c88000'),
+            'vendor_cmdline': hdr.get('cmdline', 'bootopt=64S3,32N2,64N2'),
+            'board_platform': info.board_name,
+        }
+
+    def _write_templated(self, name_tpl, tpl, ns):
+        name = name_tpl.format_map(ns)
+        _write_text(os.path.join(self.device_path, name), tpl.format_map(ns))
+        log.info("%s generated", name)
 
     def _generate_system_prop(self):
         path = os.path.join(self.device_path, 'system.prop')
-        with open(path, 'w') as f:
-            f.write(f"""# Fstab
+        header = """# Fstab
 ro.postinstall.fstab.prefix=/system
 
 # USB MTP
@@ -1161,49 +1312,55 @@ ro.vendor.mtk_tee_gp_support=1
 ro.vendor.mtk_trustonic_tee_support=1
 
 keymaster_ver=4.1
-""")
-            f.write("\n# Additional properties from device\n")
-            for key in ['ro.build.version.sdk', 'ro.build.version.release', 'ro.board.platform']:
-                if key in self.info.props:
-                    f.write(f"{key}={self.info.props[key]}\n")
+"""
+        p = self.info.props
+        tail = ''.join(f"{k}={p[k]}\n"
+                       for k in ('ro.build.version.sdk', 'ro.build.version.release', 'ro.board.platform')
+                       if k in p)
+        _write_text(path, header + "\n# Additional properties from device\n" + tail)
         log.info("system.prop generated")
 
     def _generate_vendorsetup(self):
         path = os.path.join(self.device_path, 'vendorsetup.sh')
-        with open(path, 'w') as f:
-            f.write("#!/bin/bash\n")
-            f.write(f"add_lunch_combo twrp_{self.info.codename}-eng\n")
+        _write_text(path, "#!/bin/bash\n"
+                    f"add_lunch_combo twrp_{self.info.codename}-eng\n")
         os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
         log.info("vendorsetup.sh generated")
 
     def _generate_readme(self):
         path = os.path.join(self.device_path, 'README.md')
-        with open(path, 'w') as f:
-            f.write(f"# TWRP Device Tree for {self.info.device_name}\n\n")
-            f.write("Generated by transsion_twrp_vendor_boot_gen\n\n")
-            f.write("## Device specifications\n\n")
-            f.write(f"- Device: {self.info.device_name}\n")
-            f.write(f"- Board: {self.info.board_name}\n")
-            f.write(f"- Platform: {self.info.platform}\n")
-            f.write(f"- Android version: {self.info.sdk_version}\n\n")
-            f.write("## Features\n\n")
-            f.write("- Works with vendor_boot\n")
-            f.write("- Dynamic partitions: {}\n".format(self.info.dynamic_partitions))
+        content = (
+            f"# TWRP Device Tree for {self.info.device_name}\n\n"
+            "Generated by transsion_twrp_vendor_boot_gen\n\n"
+            "## Device specifications\n\n"
+            f"- Device: {self.info.device_name}\n"
+            f"- Board: {self.info.board_name}\n"
+            f"- Platform: {self.info.platform}\n"
+            f"- Android version: {self.info.sdk_version}\n\n"
+            "## Features\n\n"
+            "- Works with vendor_boot\n"
+            f"- Dynamic partitions: {self.info.dynamic_partitions}\n"
+        )
+        _write_text(path, content)
         log.info("README.md generated")
 
 # -------------------- Main --------------------
 def main():
-    print_banner()
-    time.sleep(0.5)
-
     parser = argparse.ArgumentParser(description='Generate TWRP device tree for Transsion vendor_boot devices')
     parser.add_argument('input', help='Path to vendor_boot.img OR directory containing unpacked contents')
     parser.add_argument('-o', '--output', default='./output', help='Output directory (default: ./output)')
     parser.add_argument('-v', '--verbose', action='store_true', help='Verbose logging')
+    parser.add_argument('-q', '--quiet', action='store_true', help='Do not print the startup banner')
     parser.add_argument('--keep-temp', action='store_true', help='Keep temporary working directory')
     parser.add_argument('--device-name', help='Manually specify device name (e.g., Infinix-X6885) if auto‑detection fails')
     args = parser.parse_args()
 
+    if not args.quiet:
+        print_banner()
+        # The pause is purely cosmetic; skip it when output is piped.
+        if sys.stdout.isatty():
+            time.sleep(0.25)
+
     if args.verbose:
         log.setLevel(logging.DEBUG)
 
@@ -1213,11 +1370,12 @@ def main():
         effective_output = args.output
 
     if not os.path.exists(args.input):
-        log.error(f"Path not found: {args.input}")
+        log.error("Path not found: %s", args.input)
         sys.exit(1)
 
+    import tempfile  # deferred: --help and bad-input exits never reach here
     temp_dir = tempfile.mkdtemp(prefix='twrp_vendor_')
-    log.info(f"Working directory: {temp_dir}")
+    log.info("Working directory: %s", temp_dir)
 
     try:
         if os.path.isdir(args.input):
@@ -1234,18 +1392,16 @@ def main():
         generator.generate()
 
     except Exception as e:
-        log.error(f"Fatal error: {e}", exc_info=args.verbose)
+        log.error("Fatal error: %s", e, exc_info=args.verbose)
+        sys.exit(1)
+    finally:
+        # Single cleanup path for both success and failure.
         if args.keep_temp:
-            log.info(f"Temporary directory kept at: {temp_dir}")
+            log.info("Temporary directory preserved: %s", temp_dir)
         else:
-            shutil.rmtree(temp_dir, ignore_errors=True)
-        sys.exit(1)
-    else:
-        if not args.keep_temp:
+            import shutil
             shutil.rmtree(temp_dir, ignore_errors=True)
             log.debug("Temporary directory removed.")
-        else:
-            log.info(f"Temporary directory preserved: {temp_dir}")
 
     log.info("Done!")
 